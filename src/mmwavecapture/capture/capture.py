@@ -34,15 +34,28 @@
 from __future__ import annotations
 
 import abc
+import concurrent.futures
+import copy
 import datetime
 import importlib
+import os
 import pathlib
+import stat
 import sys
-from typing import Optional, Dict, Any
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
 
-import toml
+import tomli_w
 from loguru import logger
 
+if sys.version_info >= (3, 11):
+    import tomllib
+else:
+    import tomli as tomllib
+
+
+# Parsed config cache, keyed by (resolved path, mtime_ns, size)
+_CONFIG_CACHE: Dict[Tuple[str, int, int], Dict[str, Any]] = {}
+
 
 class CaptureHardware(abc.ABC):
     """CaptureHardware is the abstract class for all capture hardware.
@@ -85,6 +98,10 @@ class CaptureHardware(abc.ABC):
 
         This stage should dump the configuration of the capture hardware
         to `base_path/<config_name>` for future reference.
+
+        .. note:: `Capture` runs this stage right after the hardware's own
+            stop stage, while other hardware may still be stopping. It
+            should not depend on other capture hardware state.
     """
 
     _hw_name: str = ""
@@ -115,9 +132,11 @@ class CaptureHardware(abc.ABC):
 
     @base_path.setter
     def base_path(self, base_path: pathlib.Path) -> None:
-        if not base_path.exists():
+        try:
+            st = base_path.stat()
+        except FileNotFoundError:
             raise ValueError(f"Base path `{base_path}/` does not exist")
-        if not base_path.is_dir():
+        if not stat.S_ISDIR(st.st_mode):
             raise ValueError(f"Base path `{base_path}/` is not a directory")
 
         self._base_path = base_path
@@ -155,39 +174,90 @@ class Capture:
     def __init__(self, base_path: pathlib.Path):
         self._cap_hw: list[CaptureHardware] = []
         self._base_path: pathlib.Path = base_path
+        self._base_path_str: str = str(base_path)
 
         # Create directory for `Capture`
         self._base_path.mkdir(exist_ok=True)
-        logger.debug(f"Capture directory created at `{self._base_path}/`")
+        logger.opt(lazy=True).debug(
+            "Capture directory created at `{}/`", lambda: self._base_path
+        )
 
     def add_capture_hardware(self, hw: CaptureHardware) -> None:
-        # Creat directory for capture hardware
-        hardware_base_path = self._base_path / hw.hw_name
-        hardware_base_path.mkdir(exist_ok=True)
-        logger.debug(f"Capture hardware directory created at `{hardware_base_path}/`")
+        self.add_capture_hardwares((hw,))
+
+    def add_capture_hardwares(self, hws: Iterable[CaptureHardware]) -> None:
+        for hw in hws:
+            # Creat directory for capture hardware, `os.makedirs` raises
+            # if the path exists but is not a directory, so we can skip
+            # the `base_path` setter validation
+            hardware_base_path_str = os.path.join(self._base_path_str, hw.hw_name)
+            os.makedirs(hardware_base_path_str, exist_ok=True)
+            hardware_base_path = pathlib.Path(hardware_base_path_str)
+            logger.opt(lazy=True).debug(
+                "Capture hardware directory created at `{}/`",
+                lambda: hardware_base_path,
+            )
+
+            hw._base_path = hardware_base_path
+
+            self._cap_hw.append(hw)
+
+    def _run_all_hardware(
+        self,
+        pool: concurrent.futures.ThreadPoolExecutor,
+        func: Callable[[CaptureHardware], None],
+    ) -> None:
+        """Run `func` on all capture hardware concurrently, and wait until
+        all of them are done. The first exception raised will be re-raised.
+        """
+        futures = [pool.submit(func, hw) for hw in self._cap_hw]
+        for future in concurrent.futures.as_completed(futures):
+            future.result()
+
+    def _start_all_hardware(self, pool: concurrent.futures.ThreadPoolExecutor) -> None:
+        """Start all capture hardware concurrently. If any of them failed
+        to start, stop all hardware before re-raising, including the failed
+        ones, as preparing may have already spawned processes and threads.
+        """
+        futures = {pool.submit(hw.start_capture): hw for hw in self._cap_hw}
+        concurrent.futures.wait(futures)
 
-        hw.base_path = hardware_base_path
+        failed = [future for future in futures if future.exception()]
+        if not failed:
+            return
 
-        self._cap_hw.append(hw)
+        stop_futures = {pool.submit(hw.stop_capture): hw for hw in self._cap_hw}
+        for future in concurrent.futures.as_completed(stop_futures):
+            if future.exception():
+                logger.opt(exception=future.exception()).error(
+                    f"{stop_futures[future].hw_name} - stop capture failed"
+                )
+
+        failed[0].result()
 
     @logger.catch(reraise=True)
     def capture(self) -> None:
-        logger.info("Preparing capture hardware")
-        for hw in self._cap_hw:
-            hw.prepare_capture()
+        # Each stage is device I/O bound, run them concurrently across
+        # hardware, and each stage is a barrier for the next stage, except
+        # stop and dump, which are fused per hardware
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=max(1, len(self._cap_hw))
+        ) as pool:
+            logger.info("Preparing capture hardware")
+            self._run_all_hardware(pool, lambda hw: hw.prepare_capture())
 
-        logger.info("Starting capture hardware")
-        for hw in self._cap_hw:
-            hw.start_capture()
-        logger.success("Capture started")
+            logger.info("Starting capture hardware")
+            self._start_all_hardware(pool)
+            logger.success("Capture started")
 
-        for hw in self._cap_hw:
-            hw.stop_capture()
-        logger.info("Capture finished")
+            logger.info("Stopping capture and dumping hardware configurations")
+            self._run_all_hardware(pool, self._stop_and_dump)
+            logger.info("Capture finished")
 
-        logger.info("Dumping capture hardware configurations")
-        for hw in self._cap_hw:
-            hw.dump_config()
+    @staticmethod
+    def _stop_and_dump(hw: CaptureHardware) -> None:
+        hw.stop_capture()
+        hw.dump_config()
 
 
 class CaptureManager:
@@ -197,6 +267,7 @@ class CaptureManager:
     The layout of dataset directory is as follows::
 
         dataset_path/           # Create when initalizing `CaptureManager`
+        ├── .last_capture_id    # Last capture ID, avoid scanning the dataset
         ├── capture_00000/      # Create when calling `CaptureManager.capture()`
         │   ├── config.toml     # Capture configuration
         │   ├── iwr1843_vert/   # Capture hardware name
@@ -222,11 +293,14 @@ class CaptureManager:
     CAPTURE_MANAGER_CONFIG_OUTPUT_FILENAME = "config.toml"
     CAPTURE_DIR_PREFIX = "capture_"
     CAPTURE_DIR_FORMAT = CAPTURE_DIR_PREFIX + "{:05d}"  # XXX: fixed to 5 digits?
+    CAPTURE_ID_COUNTER_FILENAME = ".last_capture_id"
+    CONFIG_OUTPUT_BUFFER_SIZE = 1 << 16
 
     def __init__(self, config_filename: pathlib.Path):
         self._hw: list[CaptureHardware] = []
         self._config_filename: pathlib.Path = config_filename
         self._config: Dict[str, Any] = {}
+        self._capture_id: int = 0
 
         # Load config and create dataset directory
         self._load_config(self._config_filename)
@@ -235,7 +309,8 @@ class CaptureManager:
 
         # Create capture directory
         self._capture_dir = self._get_next_capture_dir()
-        self._capture_dir.mkdir(exist_ok=True)
+        self._capture_dir.mkdir(exist_ok=False)
+        self._update_capture_id_counter()
 
         # Init logging
         logger.remove()
@@ -253,12 +328,22 @@ class CaptureManager:
             )
 
         # Unfotunately, we will need to log them here
-        logger.debug(f"Dataset directory created at `{self._dataset_dir}/`")
-        logger.debug(f"Capture directory created at `{self._capture_dir}/`")
+        logger.opt(lazy=True).debug(
+            "Dataset directory created at `{}/`", lambda: self._dataset_dir
+        )
+        logger.opt(lazy=True).debug(
+            "Capture directory created at `{}/`", lambda: self._capture_dir
+        )
 
     def _load_config(self, path: pathlib.Path) -> None:
-        with open(path) as f:
-            self._config = toml.load(f)
+        # Skip re-parsing if the config file is unchanged since last load,
+        # the cached copy is never handed out as we modify it below
+        st = path.stat()
+        key = (str(path.resolve()), st.st_mtime_ns, st.st_size)
+        if key not in _CONFIG_CACHE:
+            with open(path, "rb") as f:
+                _CONFIG_CACHE[key] = tomllib.load(f)
+        self._config = copy.deepcopy(_CONFIG_CACHE[key])
 
         # Validate configuration
         if "dataset_dir" not in self._config:
@@ -286,40 +371,73 @@ class CaptureManager:
             self._config["metadata"]["date"] = datetime.datetime.now()
 
     def _get_next_capture_dir(self) -> pathlib.Path:
-        dir_names = [
-            i.name.split(self.CAPTURE_DIR_PREFIX)[-1]
-            for i in self._dataset_dir.glob(f"{self.CAPTURE_DIR_PREFIX}*")
-        ]
+        # Trust the capture ID counter, only scan the dataset directory if
+        # the counter is missing or corrupt, or the next capture directory
+        # already exists (stale counter)
+        counter = self._dataset_dir / self.CAPTURE_ID_COUNTER_FILENAME
+        try:
+            self._capture_id = int(counter.read_text()) + 1
+        except (OSError, ValueError):
+            self._capture_id = self._scan_next_capture_id()
+
+        capture_dir = self._dataset_dir / self.CAPTURE_DIR_FORMAT.format(
+            self._capture_id
+        )
+        if capture_dir.exists():
+            self._capture_id = self._scan_next_capture_id()
+            capture_dir = self._dataset_dir / self.CAPTURE_DIR_FORMAT.format(
+                self._capture_id
+            )
 
-        next_id = 0
-        if dir_names:
-            next_id = max(map(int, dir_names)) + 1
+        logger.info(f"Capture ID: {self._capture_id}")
+        return capture_dir
+
+    def _update_capture_id_counter(self) -> None:
+        counter = self._dataset_dir / self.CAPTURE_ID_COUNTER_FILENAME
+        tmp_counter = counter.with_name(f"{counter.name}.tmp")
+        tmp_counter.write_text(str(self._capture_id))
+        os.replace(tmp_counter, counter)
+
+    def _scan_next_capture_id(self) -> int:
+        prefix = self.CAPTURE_DIR_PREFIX
+        prefix_len = len(prefix)
+        with os.scandir(self._dataset_dir) as it:
+            last_id = max(
+                (
+                    int(entry.name[prefix_len:])
+                    for entry in it
+                    if entry.name.startswith(prefix)
+                    and entry.name[prefix_len:].isdigit()
+                    and entry.is_dir(follow_symlinks=False)
+                ),
+                default=-1,
+            )
 
-        logger.info(f"Capture ID: {next_id}")
-        return self._dataset_dir / self.CAPTURE_DIR_FORMAT.format(next_id)
+        return last_id + 1
 
     def init_hw(self) -> None:
-        for hw in self._config["hardware"]:
-            logger.info(
-                f"Initializing capture hardware `{hw}` from "
-                f"`{self._config['hardware'][hw]['hw_def_class']}`"
-            )
+        # Hardware entries often share the same class (e.g. multiple radars)
+        hw_classes: Dict[str, type] = {}
+        hw_entries = self._config["hardware"]
+        hw_append = self._hw.append
+        initialized = 0
+        for hw, hw_config in hw_entries.items():
+            hw_def_class = hw_config["hw_def_class"]
+            logger.info(f"Initializing capture hardware `{hw}` from `{hw_def_class}`")
+
             # Get capture hardware class by `hw_def_class`
-            module_name, class_name = self._config["hardware"][hw][
-                "hw_def_class"
-            ].rsplit(".", 1)
-            module = importlib.import_module(module_name)
-            hw_class = getattr(module, class_name)
+            hw_class = hw_classes.get(hw_def_class)
+            if hw_class is None:
+                module_name, class_name = hw_def_class.rsplit(".", 1)
+                module = importlib.import_module(module_name)
+                hw_class = hw_classes[hw_def_class] = getattr(module, class_name)
 
             # Create capture hardware instance
-            hw_config = self._config["hardware"][hw]
-            hw_obj = hw_class(hw_name=hw, **hw_config)
-            self._hw.append(hw_obj)
+            hw_append(hw_class(hw_name=hw, **hw_config))
+            initialized += 1
             logger.success(f"Capture hardware `{hw}` initialized")
 
-        logger.success(
-            f"Total of {len(self._config['hardware'])} capture hardware initialized"
-        )
+        logger.success(f"Total of {initialized} capture hardware initialized")
 
     def capture(self) -> None:
         if not self._hw:
@@ -327,17 +445,23 @@ class CaptureManager:
 
         # Initialize capture hardware and setup capture
         capture = Capture(self._capture_dir)
-        for hw in self._hw:
-            logger.info(f"Adding capture hardware `{hw.hw_name}`")
-            capture.add_capture_hardware(hw)
+        logger.info(
+            f"Adding capture hardware {', '.join(f'`{hw.hw_name}`' for hw in self._hw)}"
+        )
+        capture.add_capture_hardwares(self._hw)
 
         # Start capture
         capture.capture()
 
         # After finishing capture, dump capture config into capture dir
         with open(
-            capture._base_path / self.CAPTURE_MANAGER_CONFIG_OUTPUT_FILENAME, "w"
+            os.path.join(
+                capture._base_path_str, self.CAPTURE_MANAGER_CONFIG_OUTPUT_FILENAME
+            ),
+            "wb",
+            buffering=self.CONFIG_OUTPUT_BUFFER_SIZE,
         ) as f:
-            toml.dump(self._config, f)
+            # tomli-w writes the config in many small chunks
+            tomli_w.dump(self._config, f)
 
         logger.success(f"Capture finished, all files output to `{capture._base_path}/`")
@@ -33,11 +33,17 @@
 
 from __future__ import annotations
 
+import concurrent.futures
+import ctypes
+import os
 import time
 import pathlib
+import select
 import signal
+import socket
+import struct
 import subprocess
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 
 import netifaces
 from loguru import logger
@@ -52,6 +58,25 @@ class RadarDCA(CaptureHardware):
     PCAP_OUTPUT_FILENAME = "dca.pcap"
     RADAR_CONFIG_FILENAME = "radar.cfg"
     DCA_CONFIG_FILENAME = "dca.json"
+    TCPDUMP_START_TIMEOUT = 5.0  # seconds
+    CATCHER_SNAPLEN = 256
+    SO_ATTACH_FILTER = 26  # Not exported by `socket`, asm-generic/socket.h
+
+    # Classic BPF of `udp[10:4] == 0x0a000001` (no LVDS data) on Ethernet,
+    # same as `tcpdump -dd -s 256`
+    CATCHER_BPF = (
+        (0x28, 0, 0, 0x0000000C),  # ldh [12]
+        (0x15, 0, 8, 0x00000800),  # jeq #0x800 (IPv4)
+        (0x30, 0, 0, 0x00000017),  # ldb [23]
+        (0x15, 0, 6, 0x00000011),  # jeq #0x11 (UDP)
+        (0x28, 0, 0, 0x00000014),  # ldh [20]
+        (0x45, 4, 0, 0x00001FFF),  # jset #0x1fff (fragment offset)
+        (0xB1, 0, 0, 0x0000000E),  # ldxb 4*([14]&0xf)
+        (0x40, 0, 0, 0x00000018),  # ld [x + 24]
+        (0x15, 0, 1, 0x0A000001),  # jeq #0xa000001
+        (0x06, 0, 0, CATCHER_SNAPLEN),  # ret #256
+        (0x06, 0, 0, 0x00000000),  # ret #0
+    )
 
     @logger.catch(reraise=True)
     def __init__(
@@ -66,6 +91,8 @@ class RadarDCA(CaptureHardware):
         host_ip: str = "192.168.33.30",
         capture_frames: int = 100,
         init_capture_hw: bool = True,
+        kernel_buffer_kb: int = 32768,
+        tcpdump_cpu: Optional[int] = None,
         **kwargs: Dict[str, Any],
     ) -> None:
         self.hw_name = hw_name
@@ -78,10 +105,16 @@ class RadarDCA(CaptureHardware):
         self._host_ip = host_ip
         self._capture_frames = capture_frames
         self._init_capture_hw = init_capture_hw
+        self._kernel_buffer_kb = kernel_buffer_kb
+        self._tcpdump_cpu = tcpdump_cpu
+
+        if tcpdump_cpu is not None and tcpdump_cpu not in os.sched_getaffinity(0):
+            raise ValueError(f"CPU {tcpdump_cpu} is not available")
 
         # tcpdump
-        self._cap_tcpdump = None
-        self._catcher = None
+        self._cap_tcpdump: Optional[subprocess.Popen] = None
+        self._catcher: Optional[subprocess.Popen] = None
+        self._catcher_sock: Optional[socket.socket] = None
 
         # DCA interface & host IP check
         if dca_eth_interface not in netifaces.interfaces():
@@ -119,23 +152,46 @@ class RadarDCA(CaptureHardware):
         if not self.dca.system_connection():
             raise RuntimeError(f"DCA1000EVM connection error at {self._dca_ip}")
 
-        # Initialize DCA1000EVM
+        # Reset radar first, the radar initialization depends on it
         self.dca.reset_radar()
-        self.dca.reset_fpga()
-        self.dca.config_fpga()
-        self.dca.config_packet_delay()
 
-        # Initialize radar
-        self.radar.initialize()
-        self.radar.config()
+        # Configure DCA1000EVM FPGA (UDP) while initializing radar (UART),
+        # they are independent devices
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as pool:
+            dca_future = pool.submit(self._init_dca_fpga)
+
+            # Initialize radar, report the DCA1000EVM error as well if both
+            # failed, otherwise it is lost behind the radar error
+            try:
+                self.radar.initialize()
+                self.radar.config()
+            except Exception:
+                dca_exception = dca_future.exception()
+                if dca_exception:
+                    logger.opt(exception=dca_exception).error(
+                        f"{self.hw_name} - DCA1000EVM FPGA configuration failed"
+                    )
+                raise
+
+            dca_future.result()
 
         # Set init flag (they could call after class initialization)
-        self.init_capture_hw = True
+        self._init_capture_hw = True
+
+    def _init_dca_fpga(self) -> None:
+        self.dca.reset_fpga()
+        self.dca.config_fpga()
+        self.dca.config_packet_delay()
 
     def start_tcpdump_capture(self, outfile: pathlib.Path) -> None:
         self._cap_tcpdump = subprocess.Popen(
             [
                 self.TCPDUMP_BIN_PATH,
+                # Larger kernel capture buffer to avoid drops on DCA bursts,
+                # raise `kernel_buffer_kb` in config for long captures.
+                # No `-U`, let libpcap batch the writes to the pcap file
+                "-B",
+                str(self._kernel_buffer_kb),
                 "-i",
                 self._dca_eth_interface,
                 "-qtn",
@@ -144,49 +200,152 @@ class RadarDCA(CaptureHardware):
                 outfile,
             ],
             stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            bufsize=0,
         )
 
+        # Pin tcpdump to the CPU handling the NIC RX interrupts, so the
+        # packets stay in the same cache
+        if self._tcpdump_cpu is not None:
+            os.sched_setaffinity(self._cap_tcpdump.pid, {self._tcpdump_cpu})
+
+    def _wait_tcpdump_listening(self, proc: subprocess.Popen) -> None:
+        """Wait until tcpdump reports `listening on <interface>` on stderr,
+        which is printed after the capture handle and filter are activated.
+        """
+        if not proc.stderr:
+            raise ValueError("tcpdump stderr is not piped")
+
+        fd = proc.stderr.fileno()
+        output = b""
+        deadline = time.monotonic() + self.TCPDUMP_START_TIMEOUT
+        while b"listening on" not in output:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise RuntimeError(
+                    f"tcpdump did not start capture in {self.TCPDUMP_START_TIMEOUT}s"
+                )
+
+            ready, _, _ = select.select([fd], [], [], remaining)
+            if not ready:
+                continue
+
+            chunk = os.read(fd, 4096)
+            if not chunk:
+                raise RuntimeError(
+                    f"tcpdump exited with {proc.wait()}: {output.decode(errors='replace')}"
+                )
+            output += chunk
+
     def stop_tcpdump_capture(self) -> None:
         if not self._cap_tcpdump:
             return
 
         self._cap_tcpdump.send_signal(signal.SIGUSR2)  # Flush buffer
         self._cap_tcpdump.send_signal(signal.SIGINT)  # Stop capturing
-        self._cap_tcpdump.wait()  # Wait for tcpdump
+        self._cap_tcpdump.communicate()  # Wait for tcpdump, drain stderr
+        self._cap_tcpdump = None
 
-    @logger.catch(reraise=True)
-    def prepare_capture(self) -> None:
-        if not self._init_capture_hw:
-            raise RuntimeError(
-                "Capture hardware are not initialized, run `.init_capture_hw()` first"
-            )
+    def _terminate_tcpdump(self, proc: subprocess.Popen) -> None:
+        proc.terminate()
+        try:
+            proc.communicate(timeout=self.TCPDUMP_START_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.communicate()
 
-        if not self.base_path:
-            raise ValueError("Base path is not set")
+    def _abort_tcpdump_capture(self) -> None:
+        """Terminate the tcpdump processes and catcher socket of a capture
+        that failed to start.
+        """
+        for proc in (self._cap_tcpdump, self._catcher):
+            if proc:
+                self._terminate_tcpdump(proc)
+        self._cap_tcpdump = None
+        self._catcher = None
+
+        if self._catcher_sock:
+            self._catcher_sock.close()
+            self._catcher_sock = None
 
-        # Start DCA tcpdump
-        self.start_tcpdump_capture(outfile=self.base_path / self.PCAP_OUTPUT_FILENAME)
+    def start_catcher(self) -> None:
+        """Start catching the DCA1000EVM termination (no LVDS data) packet.
+
+        The filter is attached to an in-process AF_PACKET socket, the packet
+        is queued in the socket until `stop_capture` reads it. Fall back to a
+        tcpdump process when the socket is unavailable, e.g. no AF_PACKET
+        support or only tcpdump has the capture privileges.
+        """
+        try:
+            self._catcher_sock = self._open_catcher_socket()
+            return
+        except (AttributeError, OSError) as e:
+            logger.debug(
+                f"{self.hw_name} - AF_PACKET catcher unavailable ({e!r}), "
+                "catch by tcpdump"
+            )
 
-        # Start DCA termination catcher
         self._catcher = subprocess.Popen(
             [
                 self.TCPDUMP_BIN_PATH,
                 "-i",
                 self._dca_eth_interface,
                 "-s",
-                "256",
+                str(self.CATCHER_SNAPLEN),
                 "-c",
                 "1",
                 "-qtn",
                 "udp[10:4] == 0x0a000001",  # Match no LVDS data
             ],
             stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            bufsize=0,
         )
 
-        # Wait tcpdump to start capture
-        time.sleep(0.1)  # XXX: Another constant?
+    def _open_catcher_socket(self) -> socket.socket:
+        # Open without protocol, so no packets are queued before the filter
+        # is attached, then bind to all protocols on the DCA interface
+        sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, 0)
+        try:
+            bpf = b"".join(struct.pack("HBBI", *ins) for ins in self.CATCHER_BPF)
+            bpf_buffer = ctypes.create_string_buffer(bpf, len(bpf))
+            sock.setsockopt(
+                socket.SOL_SOCKET,
+                self.SO_ATTACH_FILTER,
+                struct.pack("HP", len(self.CATCHER_BPF), ctypes.addressof(bpf_buffer)),
+            )
+            sock.bind((self._dca_eth_interface, 0x0003))  # ETH_P_ALL
+        except BaseException:
+            sock.close()
+            raise
+        return sock
+
+    def prepare_capture(self) -> None:
+        if not self._init_capture_hw:
+            raise RuntimeError(
+                "Capture hardware are not initialized, run `.init_capture_hw()` first"
+            )
+
+        if not self.base_path:
+            raise ValueError("Base path is not set")
+
+        # Don't leave tcpdump running if the capture failed to start
+        try:
+            # Start DCA tcpdump
+            self.start_tcpdump_capture(
+                outfile=self.base_path / self.PCAP_OUTPUT_FILENAME
+            )
+
+            # Start DCA termination catcher
+            self.start_catcher()
+
+            # Wait tcpdump to start capture
+            for proc in (self._cap_tcpdump, self._catcher):
+                if proc:
+                    self._wait_tcpdump_listening(proc)
+        except BaseException:
+            self._abort_tcpdump_capture()
+            raise
 
         # Start DCA1000EVM
         self.dca.start_record()
@@ -195,9 +354,20 @@ class RadarDCA(CaptureHardware):
         self.radar.start_sensor()
 
     def stop_capture(self) -> None:
-        if self._catcher:
-            self._catcher.wait()
-        self.stop_tcpdump_capture()
+        try:
+            if self._catcher_sock:
+                self._catcher_sock.recv(self.CATCHER_SNAPLEN)
+                self._catcher_sock.close()
+                self._catcher_sock = None
+            if self._catcher:
+                self._catcher.communicate()
+                self._catcher = None
+            self.stop_tcpdump_capture()
+        finally:
+            # Release the radar serial ports, capture again requires
+            # `.init_capture_hw()` to reconnect and reconfigure the radar
+            self.radar.close_serials()
+            self._init_capture_hw = False
 
     def dump_config(self) -> None:
         if not self.base_path:
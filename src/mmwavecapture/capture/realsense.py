@@ -33,14 +33,20 @@
 
 from __future__ import annotations
 
-import json
+import functools
+import os
+import queue
+import re
+import shutil
+import subprocess
 import threading
 import pathlib
-from typing import Optional, Tuple, Any, Dict, NamedTuple, BinaryIO
+from typing import Optional, Tuple, Any, Callable, Dict, NamedTuple, BinaryIO, Union
 
 import cv2
 import pyrealsense2 as rs
 import numpy as np
+import orjson
 import zstandard as zstd
 from loguru import logger
 
@@ -72,9 +78,17 @@ RECTS = (
 )
 
 
-def stamp_framenum(img: np.ndarray, frame: int) -> np.ndarray:
-    text = f"{frame:04d}"
+# Filled rectangle area, the frame number text is drawn within it
+STAMP_ROI = (
+    slice(RECTS[1][1], RECTS[0][1] + 1),
+    slice(RECTS[0][0], RECTS[1][0] + 1),
+)
+
+# Rendered stamps kept by each camera, only the recent ones are reused
+STAMP_CACHE_SIZE = 64
 
+
+def _draw_framenum(img: np.ndarray, frame: int) -> np.ndarray:
     img = cv2.rectangle(img, *RECTS)
 
     img = cv2.putText(
@@ -91,6 +105,92 @@ def stamp_framenum(img: np.ndarray, frame: int) -> np.ndarray:
     return img
 
 
+def render_stamp(frame: int) -> np.ndarray:
+    """Render the stamp image of a frame number"""
+    canvas = np.zeros((STAMP_ROI[0].stop, STAMP_ROI[1].stop, 3), dtype=np.uint8)
+    return _draw_framenum(canvas, frame)[STAMP_ROI].copy()
+
+
+def stamp_framenum(
+    img: np.ndarray,
+    frame: int,
+    render: Callable[[int], np.ndarray] = render_stamp,
+) -> np.ndarray:
+    # Text wider than 4 digits or image too small to hold the whole stamp,
+    # draw it directly and let OpenCV clip it
+    if (
+        frame > 9999
+        or img.shape[0] < STAMP_ROI[0].stop
+        or img.shape[1] < STAMP_ROI[1].stop
+    ):
+        return _draw_framenum(img, frame)
+
+    img[STAMP_ROI] = render(frame)
+    return img
+
+
+def _copy_frame(src: np.ndarray, dst: np.ndarray) -> None:
+    np.copyto(dst, src)
+
+
+def _rotate_frame(src: np.ndarray, dst: np.ndarray) -> None:
+    cv2.rotate(src, cv2.ROTATE_90_CLOCKWISE, dst=dst)
+
+
+class FFmpegVideoWriter:
+    """Video writer that pipes raw BGR frames to an ffmpeg process, with the
+    same `write`, `release` and `isOpened` methods as `cv2.VideoWriter`
+    """
+
+    FFMPEG_BIN_PATH = "ffmpeg"
+
+    def __init__(
+        self,
+        filename: pathlib.Path,
+        input_args: list[str],
+        output_args: list[str],
+        fps: int,
+        frame_size: Tuple[int, int],
+    ) -> None:
+        self._proc = subprocess.Popen(
+            [
+                self.FFMPEG_BIN_PATH,
+                "-hide_banner",
+                "-loglevel",
+                "error",
+                "-y",
+                *input_args,
+                "-f",
+                "rawvideo",
+                "-pix_fmt",
+                "bgr24",
+                "-s",
+                f"{frame_size[0]}x{frame_size[1]}",
+                "-r",
+                str(fps),
+                "-i",
+                "-",
+                *output_args,
+                str(filename),
+            ],
+            stdin=subprocess.PIPE,
+        )
+
+    def isOpened(self) -> bool:
+        return self._proc.poll() is None
+
+    def write(self, image: np.ndarray) -> None:
+        if not self._proc.stdin:
+            raise RuntimeError("ffmpeg stdin is closed")
+        self._proc.stdin.write(image.data)
+
+    def release(self) -> None:
+        if self._proc.stdin:
+            self._proc.stdin.close()
+        if self._proc.wait() != 0:
+            raise RuntimeError(f"ffmpeg exited with {self._proc.returncode}")
+
+
 class CameraIntrinsics:
     """Camera intrinsics
 
@@ -130,6 +230,42 @@ class ColorMetadata(NamedTuple):
     actual_fps: int
 
 
+# Metadata column dtypes, librealsense frame metadata values are integers
+METADATA_DTYPES: Dict[str, Any] = {
+    "frame_num": np.int64,
+    "timestamp": np.float64,
+    "stamp_frame_num": np.int64,
+    "time_of_arrival": np.int64,
+    "backend_timestamp": np.int64,
+    "frame_timestamp": np.int64,
+    "actual_fps": np.int64,
+}
+
+
+class MetadataColumns:
+    """Per-frame metadata stored in pre-allocated columns, indexed by
+    the stamped frame number
+    """
+
+    def __init__(self, fields: Tuple[str, ...], size: int) -> None:
+        self.fields = fields
+        self.columns = [np.empty(size, dtype=METADATA_DTYPES[f]) for f in fields]
+
+        #: Number of frames recorded
+        self.size = 0
+
+    def set(self, index: int, values: Tuple[Any, ...]) -> None:
+        for column, value in zip(self.columns, values):
+            column[index] = value
+        self.size = max(self.size, index + 1)
+
+    def to_records(self) -> list[dict]:
+        return [
+            dict(zip(self.fields, row))
+            for row in zip(*(column[: self.size].tolist() for column in self.columns))
+        ]
+
+
 class ColorConfig:
     def __init__(self, intrinsics: CameraIntrinsics, fps: int) -> None:
         #: Camera intrinsics
@@ -177,6 +313,30 @@ class Realsense(CaptureHardware):
     DEPTH_OUTPUT_FILENAME = "depth.zst"
     DEPTH_CONFIG_FILENAME = "depth_config.json"
     DEPTH_METADATA_FILENAME = "depth_metadata.json"
+    COLOR_FRAME_POOL_SIZE = 4
+    DEPTH_FRAME_POOL_SIZE = 4
+    DEPTH_OUTPUT_BUFFER_SIZE = 1 << 20
+    CAPTURE_STALL_TIMEOUT = 5.0  # seconds without a new frame
+
+    # GStreamer H.264 encoder elements, in `auto` preference order
+    GST_VIDEO_ENCODERS = {
+        "nvenc": "nvh264enc bitrate=8000",
+        "vaapi": "vaapih264enc bitrate=8000",
+    }
+
+    # ffmpeg H.264 encoders, as (input args, output args). They are not
+    # tried by `auto`, ffmpeg only fails on the first frame when the GPU
+    # is missing
+    FFMPEG_VIDEO_ENCODERS: Dict[str, Tuple[list[str], list[str]]] = {
+        "ffmpeg-nvenc": (
+            [],
+            ["-c:v", "h264_nvenc", "-preset", "p1", "-tune", "ll"],
+        ),
+        "ffmpeg-vaapi": (
+            ["-vaapi_device", "/dev/dri/renderD128"],
+            ["-vf", "format=nv12,hwupload", "-c:v", "h264_vaapi"],
+        ),
+    }
 
     def __init__(
         self,
@@ -188,6 +348,10 @@ class Realsense(CaptureHardware):
         rotate: bool = False,
         latency_skip_frames: int = 3,
         depth_visual_preset: int = 3,
+        video_encoder: str = "xvid",
+        capture_cpu: Optional[int] = None,
+        encoder_cpu: Optional[int] = None,
+        depth_compress_threads: int = 2,
         **kwargs: Dict[str, Any],
     ) -> None:
         self.hw_name = hw_name
@@ -198,28 +362,76 @@ class Realsense(CaptureHardware):
         self._rotate = rotate
         self._latency_skip_frames = latency_skip_frames
         self._depth_visual_preset = depth_visual_preset
+        self._video_encoder = video_encoder
+
+        # Pin the capture and encoder threads to CPUs, to keep the color
+        # frames in cache between them, e.g. on a 4-core machine: radar 0,
+        # tcpdump 1, capture 2, encoder 3
+        self._capture_cpu = capture_cpu
+        self._encoder_cpu = encoder_cpu
+
+        for cpu in (capture_cpu, encoder_cpu):
+            if cpu is not None and cpu not in os.sched_getaffinity(0):
+                raise ValueError(f"CPU {cpu} is not available")
+
+        if video_encoder not in (
+            "xvid",
+            "auto",
+            *self.GST_VIDEO_ENCODERS,
+            *self.FFMPEG_VIDEO_ENCODERS,
+        ):
+            raise ValueError(f"Unknown video encoder: {video_encoder}")
 
         # Capture thread
         self._capture_thread: Optional[threading.Thread] = None
         self._capture_start_event = threading.Event()
+        self._capture_stop_event = threading.Event()
+        self._capture_error: Optional[BaseException] = None
+        self._captured_frames = 0
+
+        # Frame number stamps, rendered on first use by the color encoder
+        self._render_stamp = functools.lru_cache(maxsize=STAMP_CACHE_SIZE)(render_stamp)
+
+        # Camera warmup thread, started by `init_capture_hw`
+        self._warmup_thread: Optional[threading.Thread] = None
+        self._warmup_error: Optional[BaseException] = None
+
+        # Color encoder and depth compressor threads, fed by the capture
+        # thread with pool frames, `None` marks the end of capture
+        self._encode_thread: Optional[threading.Thread] = None
+        self._encode_queue: queue.Queue[
+            Optional[Tuple[np.ndarray, int]]
+        ] = queue.Queue()
+        self._compress_thread: Optional[threading.Thread] = None
+        self._compress_queue: queue.Queue[
+            Optional[Tuple[np.ndarray, int]]
+        ] = queue.Queue()
+        self._write_error: Optional[BaseException] = None
 
         # Realsense HW
         self._pipeline = rs.pipeline()
         self._config = rs.config()
 
         # Output video file
-        self._colorwriter: Optional[cv2.VideoWriter] = None
+        self._colorwriter: Optional[Union[cv2.VideoWriter, FFmpegVideoWriter]] = None
+        self._color_pool: list[np.ndarray] = []
+        self._color_free: queue.Queue[np.ndarray] = queue.Queue()
 
         # Output depth file
-        self._depthcctx = zstd.ZstdCompressor(level=3)
+        # Multi-threaded compression with a few workers by default, all CPUs
+        # (-1) would compete with the capture and encoder threads, 0
+        # compresses in the depth compressor thread only
+        self._depthcctx = zstd.ZstdCompressor(level=3, threads=depth_compress_threads)
         self._depthfh: Optional[BinaryIO] = None
         self._depthwriter: Optional[zstd.ZstdCompressionWriter] = None
+        self._depth_pool: list[np.ndarray] = []
+        self._depth_free: queue.Queue[np.ndarray] = queue.Queue()
 
         # Metadata
         self._color_config: Optional[ColorConfig] = None
         self._depth_config: Optional[DepthConfig] = None
-        self._color_metadata: list[dict] = []
-        self._depth_metadata: list[dict] = []
+        self._color_metadata = MetadataColumns(ColorMetadata._fields, capture_frames)
+        self._depth_metadata = MetadataColumns(DepthMetadata._fields, capture_frames)
 
         self.init_capture_hw()
 
@@ -266,8 +478,8 @@ class Realsense(CaptureHardware):
 
         # There is a huge latency when starting the camera
         # to wait the frames, so start it earlier.
-        # This add additional overhead when init the hardware,
-        # but it's fine.
+        # Wait it in background, to overlap with other hardware
+        # initialization, `prepare_capture` waits for it.
         #
         #  Line #      Hits         Time  Per Hit   % Time  Line Contents
         #  ==============================================================
@@ -277,22 +489,68 @@ class Realsense(CaptureHardware):
         #
         #      25         1      30578.7  30578.7      1.9      frames = pp.wait_for_frames()
         #
-        self._pipeline.wait_for_frames(10000)
+        self._warmup_thread = threading.Thread(target=self._warmup)
+        self._warmup_thread.start()
+
+    def _warmup(self) -> None:
+        try:
+            self._pipeline.wait_for_frames(10000)
+        except Exception as e:
+            self._warmup_error = e
 
     def prepare_capture(self) -> None:
         if not self.base_path:
             raise ValueError("Base path not set")
 
-        self._colorwriter = cv2.VideoWriter(
-            str(self.base_path / self.COLOR_OUTPUT_FILENAME),
-            cv2.VideoWriter_fourcc(*"XVID"),
-            self._fps,
-            self._resolution if not self._rotate else self._resolution[::-1],
-            1,
-        )  # type: ignore
+        if self._warmup_thread:
+            self._warmup_thread.join()
+        if self._warmup_error is not None:
+            raise RuntimeError(
+                f"{self.hw_name} - camera warmup failed"
+            ) from self._warmup_error
 
-        self._depthfh = open(self.base_path / self.DEPTH_OUTPUT_FILENAME, "wb")
-        self._depthwriter = self._depthcctx.stream_writer(self._depthfh)
+        self._colorwriter = self._open_colorwriter(
+            self.base_path / self.COLOR_OUTPUT_FILENAME
+        )
+
+        self._depthfh = open(
+            self.base_path / self.DEPTH_OUTPUT_FILENAME,
+            "wb",
+            buffering=self.DEPTH_OUTPUT_BUFFER_SIZE,
+        )
+        self._depthwriter = self._depthcctx.stream_writer(self._depthfh, closefd=False)
+
+        # Pre-allocate color and depth frames, we copy (or rotate) the
+        # RealSense frames into them, instead of allocating new images
+        # for each frame
+        color_shape = (
+            (self._resolution[1], self._resolution[0], 3)
+            if not self._rotate
+            else (self._resolution[0], self._resolution[1], 3)
+        )
+        self._color_pool = [
+            np.empty(color_shape, dtype=np.uint8)
+            for _ in range(self.COLOR_FRAME_POOL_SIZE)
+        ]
+        for color_image in self._color_pool:
+            self._color_free.put(color_image)
+
+        depth_shape = (
+            (self._depth_resolution[1], self._depth_resolution[0])
+            if not self._rotate
+            else (self._depth_resolution[0], self._depth_resolution[1])
+        )
+        self._depth_pool = [
+            np.empty(depth_shape, dtype=np.uint16)
+            for _ in range(self.DEPTH_FRAME_POOL_SIZE)
+        ]
+        for depth_image in self._depth_pool:
+            self._depth_free.put(depth_image)
+
+        self._encode_thread = threading.Thread(target=self._encode)
+        self._encode_thread.start()
+        self._compress_thread = threading.Thread(target=self._compress)
+        self._compress_thread.start()
 
         self._capture_thread = threading.Thread(target=self._capture)
 
@@ -303,14 +561,154 @@ class Realsense(CaptureHardware):
         # Mine is 90ms, set to 3 (90ms / 30 fps)
         self._capture_thread.start()
 
+    def _open_colorwriter(
+        self, path: pathlib.Path
+    ) -> Union[cv2.VideoWriter, FFmpegVideoWriter]:
+        """Open the color video writer for the configured encoder.
+
+        Hardware encoders go through a GStreamer pipeline or an ffmpeg
+        process, and fall back to XVID when OpenCV, ffmpeg or the encoder
+        is not available.
+        """
+        frame_size = self._resolution if not self._rotate else self._resolution[::-1]
+
+        if self._video_encoder in self.FFMPEG_VIDEO_ENCODERS:
+            if shutil.which(FFmpegVideoWriter.FFMPEG_BIN_PATH):
+                input_args, output_args = self.FFMPEG_VIDEO_ENCODERS[
+                    self._video_encoder
+                ]
+                logger.info(
+                    f"{self.hw_name} - Encode color video with {self._video_encoder}"
+                )
+                return FFmpegVideoWriter(
+                    path, input_args, output_args, self._fps, frame_size
+                )
+            logger.warning(f"{self.hw_name} - ffmpeg not found")
+
+        if self._video_encoder == "auto":
+            encoders = list(self.GST_VIDEO_ENCODERS)
+        elif self._video_encoder in self.GST_VIDEO_ENCODERS:
+            encoders = [self._video_encoder]
+        else:
+            encoders = []
+
+        if encoders and not re.search(r"GStreamer:\s*YES", cv2.getBuildInformation()):
+            logger.warning(f"{self.hw_name} - OpenCV built without GStreamer")
+            encoders = []
+
+        for encoder in encoders:
+            pipeline = (
+                "appsrc ! videoconvert ! "
+                f"{self.GST_VIDEO_ENCODERS[encoder]} ! h264parse ! "
+                f'avimux ! filesink location="{path}"'
+            )
+            writer = cv2.VideoWriter(
+                pipeline, cv2.CAP_GSTREAMER, 0, self._fps, frame_size, True
+            )
+            if writer.isOpened():
+                logger.info(f"{self.hw_name} - Encode color video with {encoder}")
+                return writer
+            logger.warning(f"{self.hw_name} - Failed to open {encoder} encoder")
+
+        if self._video_encoder != "xvid":
+            logger.warning(f"{self.hw_name} - Fall back to XVID encoder")
+
+        return cv2.VideoWriter(
+            str(path),
+            cv2.VideoWriter_fourcc(*"XVID"),
+            self._fps,
+            frame_size,
+            1,
+        )  # type: ignore
+
+    def _write_frames(
+        self,
+        frames: queue.Queue[Optional[Tuple[np.ndarray, int]]],
+        free: queue.Queue[np.ndarray],
+        write: Callable[[np.ndarray, int], None],
+        name: str,
+    ) -> None:
+        """Write frames from the capture thread, until `None` is received.
+
+        Each writer runs in its own thread so a slow encode or compress does
+        not make the capture thread miss frames. Frames are returned to the
+        pool after written, even on error, so the capture thread never blocks.
+        """
+        while True:
+            item = frames.get()
+            if item is None:
+                return
+
+            image, stamp_frame_num = item
+            try:
+                if self._write_error is None:
+                    write(image, stamp_frame_num)
+            except Exception as e:
+                logger.exception(f"{self.hw_name} - {name} failed")
+                self._write_error = e
+
+                # Frames are not written anymore, no need to capture
+                self._capture_stop_event.set()
+            finally:
+                free.put(image)
+
+    def _encode(self) -> None:
+        """Stamp and encode color frames"""
+        if self._encoder_cpu is not None:
+            os.sched_setaffinity(0, {self._encoder_cpu})
+
+        self._write_frames(
+            self._encode_queue, self._color_free, self._write_color, "color encoder"
+        )
+
+    def _write_color(self, color_image: np.ndarray, stamp_frame_num: int) -> None:
+        if self._colorwriter:
+            self._colorwriter.write(
+                stamp_framenum(color_image, stamp_frame_num, self._render_stamp)
+            )
+
+    def _compress(self) -> None:
+        """Compress and write depth frames"""
+        self._write_frames(
+            self._compress_queue,
+            self._depth_free,
+            self._write_depth,
+            "depth compressor",
+        )
+
+    def _write_depth(self, depth_image: np.ndarray, stamp_frame_num: int) -> None:
+        if self._depthwriter:
+            # Pool frames are C-contiguous, write them without a bytes copy
+            self._depthwriter.write(depth_image.data.cast("B"))
+
     def _capture(self) -> None:
+        try:
+            if self._capture_cpu is not None:
+                os.sched_setaffinity(0, {self._capture_cpu})
+
+            self._capture_frames_loop()
+        except Exception as e:
+            logger.exception(f"{self.hw_name} - capture failed")
+            self._capture_error = e
+        finally:
+            # Always stop the writer threads
+            self._encode_queue.put(None)
+            self._compress_queue.put(None)
+
+    def _capture_frames_loop(self) -> None:
         if not self._colorwriter:
             raise ValueError("Color writer not initialized")
         if not self._depthwriter:
             raise ValueError("Depth writer not initialized")
 
+        # Resolve the rotate option once, instead of for each frame
+        copy_frame = _rotate_frame if self._rotate else _copy_frame
+
         current_frame = 0
-        while current_frame != self._capture_frames + self._latency_skip_frames:
+        while (
+            current_frame != self._capture_frames + self._latency_skip_frames
+            and not self._capture_stop_event.is_set()
+        ):
             frames = self._pipeline.wait_for_frames()
             color_frame = frames.get_color_frame()
             depth_frame = frames.get_depth_frame()
@@ -318,32 +716,32 @@ class Realsense(CaptureHardware):
             if not color_frame or not depth_frame:
                 continue
 
-            # Convert color frame to color image
-            color_image = np.asanyarray(color_frame.get_data())
-
-            # Convert depth frame to depth image
-            depth_image = np.asanyarray(depth_frame.get_data())
-
             # Wait for the capture to start
             if not self._capture_start_event.is_set():
                 continue
 
             # Increment frame number
             current_frame += 1
+            self._captured_frames = current_frame
 
             # Skip latency frames
             if current_frame - 1 < self._latency_skip_frames:
                 continue
 
-            # Write to file
-            if self._rotate:
-                color_image = cv2.rotate(color_image, cv2.ROTATE_90_CLOCKWISE)
-                depth_image = cv2.rotate(depth_image, cv2.ROTATE_90_CLOCKWISE)
-
             stamp_frame_num = current_frame - self._latency_skip_frames - 1
-            color_image = stamp_framenum(color_image, stamp_frame_num)
-            self._colorwriter.write(color_image)
-            self._depthwriter.write(depth_image.tobytes())
+
+            # Convert color frame to color image, into a free pre-allocated frame
+            color_image = self._color_free.get()
+            copy_frame(np.asanyarray(color_frame.get_data()), color_image)
+
+            # Convert depth frame to depth image, into a free pre-allocated frame
+            depth_image = self._depth_free.get()
+            copy_frame(np.asanyarray(depth_frame.get_data()), depth_image)
+
+            # Write to file, color frame is stamped and encoded by encoder
+            # thread, depth frame is compressed by compressor thread
+            self._encode_queue.put((color_image, stamp_frame_num))
+            self._compress_queue.put((depth_image, stamp_frame_num))
 
             # Record metadata
             color_meta = ColorMetadata(
@@ -363,28 +761,12 @@ class Realsense(CaptureHardware):
                     rs.frame_metadata_value.actual_fps
                 ),
             )
-            depth_meta = DepthMetadata(
-                frame_num=frames.frame_number,
-                timestamp=frames.timestamp,
-                stamp_frame_num=stamp_frame_num,
-                time_of_arrival=color_frame.get_frame_metadata(
-                    rs.frame_metadata_value.time_of_arrival
-                ),
-                backend_timestamp=color_frame.get_frame_metadata(
-                    rs.frame_metadata_value.backend_timestamp
-                ),
-                frame_timestamp=color_frame.get_frame_metadata(
-                    rs.frame_metadata_value.frame_timestamp
-                ),
-                actual_fps=color_frame.get_frame_metadata(
-                    rs.frame_metadata_value.actual_fps
-                ),
-            )
+            # Depth metadata records the same color frame values, reuse them
+            # instead of querying librealsense again
+            depth_meta = DepthMetadata(*color_meta)
 
-            # XXX: Sad not to preserve `ColorMetadata` type,
-            #      but I don't want to spend time on this
-            self._color_metadata.append(color_meta._asdict())
-            self._depth_metadata.append(depth_meta._asdict())
+            self._color_metadata.set(stamp_frame_num, color_meta)
+            self._depth_metadata.set(stamp_frame_num, depth_meta)
 
     def start_capture(self) -> None:
         if not self._colorwriter:
@@ -396,25 +778,70 @@ class Realsense(CaptureHardware):
 
         self._capture_start_event.set()
 
+    def _join_capture_thread(self, thread: threading.Thread) -> None:
+        """Wait for the capture thread as long as it keeps capturing frames.
+
+        A slow encoder slows the capture down through the frame pool, which
+        is fine. No new frame for `CAPTURE_STALL_TIMEOUT` means the capture
+        stalled, stop it and report the error, the outputs would be shorter
+        than the other capture hardware's.
+        """
+        captured_frames = -1
+        while True:
+            thread.join(self.CAPTURE_STALL_TIMEOUT)
+            if not thread.is_alive():
+                return
+            if self._captured_frames == captured_frames:
+                break
+            captured_frames = self._captured_frames
+
+        self._capture_stop_event.set()
+        thread.join()
+        if self._capture_error is None:
+            self._capture_error = TimeoutError(
+                f"No new frame in {self.CAPTURE_STALL_TIMEOUT}s, "
+                f"stalled after {captured_frames} frames"
+            )
+
     def stop_capture(self) -> None:
         if self._capture_thread:
-            self._capture_thread.join()
-        if self._colorwriter:
-            self._colorwriter.release()
+            self._join_capture_thread(self._capture_thread)
+        if self._encode_thread:
+            self._encode_thread.join()
+        if self._compress_thread:
+            self._compress_thread.join()
         if self._depthwriter:
             self._depthwriter.close()
         if self._depthfh:
+            self._depthfh.flush()
+            os.fsync(self._depthfh.fileno())
             self._depthfh.close()
         self._pipeline.stop()
 
+        # Release color writer last, ffmpeg writer raises when encoding failed
+        if self._colorwriter:
+            self._colorwriter.release()
+
+        if self._capture_error is not None:
+            raise RuntimeError(
+                f"{self.hw_name} - capturing frames failed"
+            ) from self._capture_error
+        if self._write_error is not None:
+            raise RuntimeError(
+                f"{self.hw_name} - writing frames failed"
+            ) from self._write_error
+
     def dump_config(self) -> None:
         if not self.base_path:
             raise ValueError("Base path not set")
-        with open(self.base_path / self.COLOR_METADATA_FILENAME, "w") as f:
-            json.dump(self._color_metadata, f, indent=4)
-        with open(self.base_path / self.DEPTH_METADATA_FILENAME, "w") as f:
-            json.dump(self._depth_metadata, f, indent=4)
-        with open(self.base_path / self.COLOR_CONFIG_FILENAME, "w") as f:
-            json.dump(self._color_config, f, indent=4, default=vars)
-        with open(self.base_path / self.DEPTH_CONFIG_FILENAME, "w") as f:
-            json.dump(self._depth_config, f, indent=4, default=vars)
+
+        # orjson is much faster than `json` with indent, which falls back
+        # to the pure Python encoder, for thousands of metadata records
+        for filename, obj in (
+            (self.COLOR_METADATA_FILENAME, self._color_metadata.to_records()),
+            (self.DEPTH_METADATA_FILENAME, self._depth_metadata.to_records()),
+            (self.COLOR_CONFIG_FILENAME, self._color_config),
+            (self.DEPTH_CONFIG_FILENAME, self._depth_config),
+        ):
+            with open(self.base_path / filename, "wb") as f:
+                f.write(orjson.dumps(obj, default=vars, option=orjson.OPT_INDENT_2))
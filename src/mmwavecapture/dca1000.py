@@ -40,7 +40,6 @@ import socket
 import struct
 import functools
 
-from copy import deepcopy
 from typing import Any, Literal, Optional, Union, overload
 
 from loguru import logger
@@ -79,6 +78,21 @@ class DCA1000Command(enum.IntEnum):
     READ_FPGA_VERSION = 0xE
 
 
+# The command footer is the same for every command
+_DCA_COMMAND_FOOTER = struct.pack("<H", DCA1000MagicNumber.MAGIC_FOOTER)
+
+# Command header (magic, command code, data size) and response
+# (magic, command code, status, footer) layouts
+_DCA_COMMAND_HEADER = struct.Struct("<HHH")
+_DCA_COMMAND_RESPONSE = struct.Struct("<HHHH")
+
+# Command data layouts
+_DCA_PACKET_DELAY_DATA = struct.Struct("<HH")
+_DCA_FPGA_CONFIG_DATA = struct.Struct("<BBBBBB")
+# Host IP, DCA IP, DCA MAC, config port, data port
+_DCA_EEPROM_CONFIG_DATA = struct.Struct("<4s4s6sHH")
+
+
 class DCA1000Config:
     default_config: dict[str, Any] = {
         "dataLoggingMode": "raw",
@@ -102,7 +116,11 @@ class DCA1000Config:
     }
 
     def __init__(self):
-        self._config = deepcopy(self.default_config)
+        # Only one level of nesting, copying the sub-dicts is enough
+        self._config = {
+            k: v.copy() if isinstance(v, dict) else v
+            for k, v in self.default_config.items()
+        }
 
     @property
     def config(self) -> dict[str, Any]:
@@ -192,6 +210,11 @@ class DCA1000:
 
         return wrapped
 
+    # Data port receive buffer, the kernel default (~212 KB) drops packets
+    # on the DCA1000EVM bursts; capped by `net.core.rmem_max`
+    DATA_RCVBUF_SIZE = 12 * 1024 * 1024
+    _rcvbuf_capped_warned = False
+
     def __init__(self) -> None:
         self.config = DCA1000Config()
         self.socks = {}
@@ -211,9 +234,28 @@ class DCA1000:
                 # Convert "DCA1000ConfigPort" to "config"
                 sockets[sock_type[7:-4].lower()] = sock
 
+        self._set_rcvbuf(sockets["data"], self.DATA_RCVBUF_SIZE)
+
         # It should have {"data": sock, "config": sock}
         return sockets
 
+    @classmethod
+    def _set_rcvbuf(cls, sock: socket.socket, size: int) -> None:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, size)
+
+        # Linux doubles the requested size for bookkeeping overhead and
+        # reports the doubled value, so halve it before comparing
+        granted = sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF) // 2
+        logger.debug(f"Data socket receive buffer is {granted} bytes")
+        if granted < size and not cls._rcvbuf_capped_warned:
+            # The sysctl is host-wide, only warn once per process
+            cls._rcvbuf_capped_warned = True
+            logger.warning(
+                f"Data socket receive buffer capped at {granted} bytes, "
+                f"requested {size}; "
+                f"raise it by `sysctl -w net.core.rmem_max={size}`"
+            )
+
     def __del__(self):
         for sock in self.socks.values():
             sock.close()
@@ -246,19 +288,19 @@ class DCA1000:
         return_raw_status: bool = False,
     ) -> Union[bool, int]:
         # Construct the command header, data, and footer
-        cmd_header = struct.pack(
-            "<HHH",
+        cmd_header = _DCA_COMMAND_HEADER.pack(
             DCA1000MagicNumber.MAGIC_HEADER,
             cmd_code,
             len(data),
         )
-        cmd_footer = struct.pack("<H", DCA1000MagicNumber.MAGIC_FOOTER)
 
         # Combine the header, data, and footer into a single command
-        cmd = cmd_header + data + cmd_footer
+        cmd = cmd_header + data + _DCA_COMMAND_FOOTER
 
-        # Setup socket timeout
-        self.socks["config"].settimeout(timeout)
+        # Setup socket timeout, `settimeout` is a syscall even if unchanged,
+        # while `gettimeout` only reads the cached value
+        if self.socks["config"].gettimeout() != timeout:
+            self.socks["config"].settimeout(timeout)
 
         # Send the command to the DCA1000
         self.socks["config"].sendto(
@@ -270,7 +312,7 @@ class DCA1000:
 
         # Decode the response
         # Reference: SPRUIJ4A, Table 14, p. 19
-        resp_dec = struct.unpack("<HHHH", resp)
+        resp_dec = _DCA_COMMAND_RESPONSE.unpack(resp)
         assert resp_dec[0] == DCA1000MagicNumber.MAGIC_HEADER
         assert resp_dec[1] == cmd_code
         assert resp_dec[3] == DCA1000MagicNumber.MAGIC_FOOTER
@@ -326,8 +368,7 @@ class DCA1000:
         # Ref: RF_API.cpp:ConfigureRFDCCard_Record
         #      FPGA_CLK_CONVERSION_FACTOR = 1000
         #      FPGA_CLK_PERIOD_IN_NANO_SEC = 8
-        data = struct.pack(
-            "<HH",
+        data = _DCA_PACKET_DELAY_DATA.pack(
             *[
                 self.config.packet_delay_us
                 * DCA1000Const.FPGA_CLK_CONVERSION_FACTOR
@@ -343,8 +384,7 @@ class DCA1000:
 
         Ref: 2.3.1 Configure FPGA, p.34, DCA1000EVM CLI Software Developer Guide, v1.01
         """
-        data = struct.pack(
-            "<BBBBBB",
+        data = _DCA_FPGA_CONFIG_DATA.pack(
             *[
                 self.config.data_logging_mode,
                 self.config.lvds_mode,
@@ -362,35 +402,19 @@ class DCA1000:
 
         Ref: 2.3.2 Configure EEPROM, p.36, DCA1000EVM CLI Software Developer Guide, v1.01
         """
-        data = struct.pack(
-            "<BBBBBBBBBBBBBBHH",
-            *[
-                # Host IP
-                *map(
-                    int,
-                    self.config.config["ethernetConfigUpdate"]["systemIPAddress"].split(
-                        "."
-                    )[::-1],
-                ),
-                # DCA IP
-                *map(
-                    int,
-                    self.config.config["ethernetConfigUpdate"][
-                        "DCA1000IPAddress"
-                    ].split(".")[::-1],
-                ),
-                # DCA MAC
-                *map(
-                    lambda x: int(x, 16),
-                    self.config.config["ethernetConfigUpdate"][
-                        "DCA1000MACAddress"
-                    ].split("-")[::-1],
-                ),
-                # DCA config port
-                self.config.config["ethernetConfigUpdate"]["DCA1000ConfigPort"],
-                # DCA data port
-                self.config.config["ethernetConfigUpdate"]["DCA1000DataPort"],
-            ],
+        # Addresses are sent in little-endian byte order
+        update = self.config.config["ethernetConfigUpdate"]
+        mac = bytes.fromhex(update["DCA1000MACAddress"].replace("-", ""))
+        if len(mac) != 6:
+            raise ValueError(
+                f"Invalid DCA1000 MAC address: {update['DCA1000MACAddress']}"
+            )
+        data = _DCA_EEPROM_CONFIG_DATA.pack(
+            socket.inet_aton(update["systemIPAddress"])[::-1],
+            socket.inet_aton(update["DCA1000IPAddress"])[::-1],
+            mac[::-1],
+            update["DCA1000ConfigPort"],
+            update["DCA1000DataPort"],
         )
         return self._send_dca_command(DCA1000Command.CONFIG_EEPROM, data)
 
@@ -58,11 +58,13 @@ class PcapCparser:
         self.data_ports = data_ports
         self.lsb_quadrature = lsb_quadrature
         self.dca_data: Dict[int, disspcap.DcaData] = {}
+        self._complex_cache: Dict[int, np.ndarray] = {}
 
         if preprocessing:
             self.preprocessing()
 
     def preprocessing(self) -> None:
+        self._complex_cache.clear()
         self.pcap.dca_fetch_packets(self.data_ports)
         for port in self.data_ports:
             dd = self.pcap.get_dca_data(port)
@@ -74,5 +76,13 @@ class PcapCparser:
         return not dd.is_out_of_order and dd.dca_report_tx_bytes == dd.received_rx_bytes
 
     def get_complex(self, port: int) -> np.ndarray[Any, np.dtype[np.complex64]]:
-        dd = self.dca_data[port]
-        return np.array(dd, copy=False, dtype=np.complex64)
+        """Get the complex samples of `port`
+
+        The array is a view of the DcaData buffer, cached per port until
+        `preprocessing` runs again.
+        """
+        sig = self._complex_cache.get(port)
+        if sig is None:
+            sig = np.asarray(self.dca_data[port], dtype=np.complex64)
+            self._complex_cache[port] = sig
+        return sig
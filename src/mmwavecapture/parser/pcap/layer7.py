@@ -31,61 +31,53 @@
 # POSSIBILITY OF SUCH DAMAGE.
 #
 
+import functools
 import struct
 
 import disspcap
 
+# DCA1000EVM raw data header: sequence ID (4 bytes) + byte count (6 bytes),
+# byte count is decoded as low 16 bits + high 32 bits
+RAW_HEADER_SIZE = 10
+_RAW_HEADER = struct.Struct("<IHI")
 
+# DCA1000EVM config packet: header + command, status, footer
+_CONFIG_HEADER = struct.Struct("<HH")
+_CONFIG_STATUS = struct.Struct(">H")
+_CONFIG_FOOTER = struct.Struct("<H")
+
+
+@functools.total_ordering
 class Raw:
     def __init__(self, packet: disspcap.Packet):
-        buf = packet.udp.payload
+        buf = memoryview(packet.udp.payload)
 
         self.ts = packet.ts
-        self.seq_id, self.byte_count = struct.unpack("<IQ", buf[:10] + b"\x00\x00")
-        self.data = buf[10:]
-
-    def __lt__(self, other):
-        return self.seq_id < other.seq_id
-
-    def __le__(self, other):
-        return self.seq_id <= other.seq_id
+        self.seq_id, byte_count_lo, byte_count_hi = _RAW_HEADER.unpack_from(buf)
+        self.byte_count = byte_count_hi << 16 | byte_count_lo
+        # A view into the packet payload, not a copy, it keeps the payload
+        # alive; use `bytes(raw.data)` if a standalone copy is needed
+        self.data = buf[RAW_HEADER_SIZE:]
 
     def __eq__(self, other):
         return self.seq_id == other.seq_id
 
-    def __ne__(self, other):
-        return self.seq_id != other.seq_id
-
-    def __gt__(self, other):
-        return self.seq_id > other.seq_id
-
-    def __ge__(self, other):
-        return self.seq_id >= other.seq_id
+    def __lt__(self, other):
+        return self.seq_id < other.seq_id
 
 
+@functools.total_ordering
 class Config:
     def __init__(self, packet: disspcap.Packet):
         buf = packet.udp.payload
 
         self.ts = packet.ts
-        self.header, self.cmd = struct.unpack("<HH", buf[:4])
-        self.status = struct.unpack(">H", buf[4:6])[0]
-        self.footer = struct.unpack("<H", buf[-2:])[0]
-
-    def __lt__(self, other):
-        return self.ts < other.ts
-
-    def __le__(self, other):
-        return self.ts <= other.ts
+        self.header, self.cmd = _CONFIG_HEADER.unpack_from(buf)
+        self.status = _CONFIG_STATUS.unpack_from(buf, 4)[0]
+        self.footer = _CONFIG_FOOTER.unpack_from(buf, len(buf) - 2)[0]
 
     def __eq__(self, other):
         return self.ts == other.ts
 
-    def __ne__(self, other):
-        return self.ts != other.ts
-
-    def __gt__(self, other):
-        return self.ts > other.ts
-
-    def __ge__(self, other):
-        return self.ts >= other.ts
+    def __lt__(self, other):
+        return self.ts < other.ts
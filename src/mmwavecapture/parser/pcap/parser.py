@@ -33,13 +33,14 @@
 
 from __future__ import annotations
 
+import operator
 import time
 import pathlib
 from collections import defaultdict
-from typing import Callable, Dict, Optional, Union
+from typing import Callable, Dict, Iterator, Optional, Union
 
 import disspcap
-from mmwavecapture.parser.pcap.layer7 import Raw, Config
+from mmwavecapture.parser.pcap.layer7 import RAW_HEADER_SIZE, Raw, Config
 
 
 class _PcapIterWrapper:
@@ -77,17 +78,45 @@ class _PcapOrderedWrapper:
 
         # Initialize all the packest, it takes time
         self.packets: defaultdict[int, list[Union[Raw, Config]]] = defaultdict(list)
+        data_ports_set = frozenset(self.data_ports)
+        config_ports_set = frozenset(self.config_ports)
         for p in self.pcap:
-            if not p.udp:
+            udp = p.udp
+            if not udp:
                 continue
-            if p.udp.destination_port in self.data_ports:
-                self.packets[p.udp.destination_port].append(Raw(p))
-            elif p.udp.destination_port in self.config_ports:
-                self.packets[p.udp.destination_port].append(Config(p))
-
-        # Sort the packets
+            port = udp.destination_port
+            if port in data_ports_set:
+                self.packets[port].append(Raw(p))
+            elif port in config_ports_set:
+                self.packets[port].append(Config(p))
+
+        # Sort the packets by key, data by sequence ID and config by timestamp,
+        # so the sort compares plain numbers instead of calling `__lt__`
         for port in self.packets:
-            self.packets[port].sort()
+            if port in data_ports_set:
+                self.packets[port].sort(key=operator.attrgetter("seq_id"))
+            else:
+                self.packets[port].sort(key=operator.attrgetter("ts"))
+
+
+def iter_raw_payloads(
+    filename: pathlib.Path,
+    data_port: int = 4098,
+) -> Iterator[memoryview]:
+    """Iterate raw data payloads from a pcap file by a specific data port.
+
+    Each payload is a view past the raw data header, nothing is copied,
+    so memory is bounded to one packet.
+
+    Note: This is not guaranteed to be in order.
+    """
+    for p in _PcapIterWrapper(filename):
+        udp = p.udp
+        if not udp:
+            continue
+        if udp.destination_port != data_port:
+            continue
+        yield memoryview(udp.payload)[RAW_HEADER_SIZE:]
 
 
 def get_raw_bytes_from_pcap(
@@ -96,18 +125,31 @@ def get_raw_bytes_from_pcap(
 ):
     """Get raw bytes from a pcap file by a specific data port.
 
-    This will return the raw bytes from the data port.
+    This will return the raw bytes from the data port, which holds the
+    whole capture in memory; prefer `dump_raw_bytes_to_file` for large
+    pcap files.
 
     Note: This is not guaranteed to be in order.
     """
-    pcap = _PcapIterWrapper(filename)
+    return b"".join(iter_raw_payloads(filename, data_port))
 
-    raw_data = []
-    for p in pcap:
-        if not p.udp:
-            continue
-        if p.udp.destination_port != data_port:
-            continue
-        raw_data.append(Raw(p).data)
 
-    return b"".join(raw_data)
+def dump_raw_bytes_to_file(
+    filename: pathlib.Path,
+    outfile: pathlib.Path,
+    data_port: int = 4098,
+) -> int:
+    """Dump raw bytes from a pcap file by a specific data port to `outfile`.
+
+    Same as `get_raw_bytes_from_pcap`, but writes the payloads as they are
+    read, instead of holding the whole capture in memory.
+
+    Note: This is not guaranteed to be in order.
+
+    :return: Number of bytes written
+    """
+    total = 0
+    with open(outfile, "wb") as f:
+        for payload in iter_raw_payloads(filename, data_port):
+            total += f.write(payload)
+    return total
@@ -34,10 +34,10 @@
 from __future__ import annotations
 
 import enum
-import re
 import pathlib
+import sys
 import time
-from typing import Optional
+from typing import Dict, Optional, Tuple
 
 import serial
 from loguru import logger
@@ -45,6 +45,39 @@ from loguru import logger
 
 RADAR_OUTPUT_REGEX = r"\n(.*?)mmwDemo"
 RADAR_STATUS_QUERY_REGEX = r"Sensor State:\s(\d+)\n\rData port baud rate:\s(\d+)"
+_RADAR_PROMPT = b"mmwDemo:/>\n"
+
+# `int.bit_count` is only available since Python 3.10
+if sys.version_info >= (3, 10):
+
+    def _popcount(x: int) -> int:
+        return x.bit_count()
+
+else:
+
+    def _popcount(x: int) -> int:
+        return bin(x).count("1")
+
+
+# Radar config commands cache, keyed by (resolved path, mtime_ns, size)
+_RADAR_CONFIG_CACHE: Dict[Tuple[str, int, int], Tuple[str, ...]] = {}
+
+
+def _load_radar_config(filename: pathlib.Path) -> list[str]:
+    """Load radar config commands, skipping comments in config file
+
+    The parsed commands are cached, a fresh list is returned on each
+    call as the caller may modify it.
+    """
+    path = pathlib.Path(filename)
+    st = path.stat()
+    key = (str(path.resolve()), st.st_mtime_ns, st.st_size)
+    if key not in _RADAR_CONFIG_CACHE:
+        with open(path) as f:
+            _RADAR_CONFIG_CACHE[key] = tuple(
+                n.strip() for n in f if not n.startswith("%")
+            )
+    return list(_RADAR_CONFIG_CACHE[key])
 
 
 class RadarStatus(enum.IntEnum):
@@ -64,28 +97,31 @@ class RadarCoreConfig:
         self._config: dict[str, list[str]] = {}
 
         # XXX: only support reading from file at this moment
+        # The file is read through the same cache as `Radar` config commands
         if filename is not None:
-            with open(filename) as f:
-                for n in f.readlines():
-                    if n.startswith("%") or " " not in n:
-                        continue
-                    cmd, args = n.strip().split(" ", 1)
-                    self._config[cmd] = args.split(" ")
+            for n in _load_radar_config(filename):
+                if " " not in n:
+                    continue
+                cmd, args = n.split(" ", 1)
+                self._config[cmd] = args.split(" ")
+
+        frame_cfg = self._config["frameCfg"]
+        channel_cfg = self._config["channelCfg"]
 
         #: Total number of frames to capture, 0 means infinite
-        self.frames: int = int(self._config["frameCfg"][3])
+        self.frames: int = int(frame_cfg[3])
 
         #: Frame period (ms)
-        self.frame_period: float = float(self._config["frameCfg"][4])
+        self.frame_period: float = float(frame_cfg[4])
 
         #: Number of chirps per frame
-        self.chirps: int = int(self._config["frameCfg"][2])
+        self.chirps: int = int(frame_cfg[2])
 
         #: Total TX antennas
-        self.tx: int = bin(int(self._config["channelCfg"][1]))[2:].count("1")
+        self.tx: int = _popcount(int(channel_cfg[1]))
 
         #: Total RX antennas
-        self.rx: int = bin(int(self._config["channelCfg"][0]))[2:].count("1")
+        self.rx: int = _popcount(int(channel_cfg[0]))
 
         #: Total virtual antennas
         self.virtual_antennas: int = self.tx * self.rx
@@ -93,11 +129,13 @@ class RadarCoreConfig:
         #: Number of ADC samples per chirp
         self.samples: int = int(self._config["profileCfg"][9])
 
+        shape_frames = self.frames if self.frames != 0 else -1
+
         #: Shape of the raw data considering TX and RX antennas.
         #:
         #: If the number of frames is 0, the first dimension will be -1
         self.antenna_shape: tuple[int, int, int, int, int] = (
-            self.frames if self.frames != 0 else -1,
+            shape_frames,
             self.chirps,
             self.tx,
             self.rx,
@@ -108,7 +146,7 @@ class RadarCoreConfig:
         #:
         #: If the number of frames is 0, the first dimension will be -1
         self.virtual_shape: tuple[int, int, int, int] = (
-            self.frames if self.frames != 0 else -1,
+            shape_frames,
             self.chirps,
             self.virtual_antennas,
             self.samples,
@@ -143,6 +181,11 @@ class Radar:
     :type initialize_connection_and_radar: bool, optional
     :param capture_frames: The number of frames to capture, defaults to 100 frames
     :type capture_frames: int, optional
+
+    .. note::
+        Use it as a context manager, ``with Radar(...) as radar:``, to close the
+        serial ports deterministically; otherwise they are closed when the
+        serial objects are garbage collected.
     """
 
     def __init__(
@@ -164,16 +207,15 @@ class Radar:
         self._data_baudrate = data_baudrate
         self._timeout = timeout
         self._config_filename = config_filename
-        self._config = [
-            n.strip()
-            for n in open(self._config_filename).readlines()
-            if not n.startswith("%")
-        ]  # skip comments in config file
+        self._config = _load_radar_config(self._config_filename)
         self.capture_frames = capture_frames
 
         self._config_serial = serial.Serial()
         self._data_serial = serial.Serial()
 
+        # Bytes read from config UART past the last prompt
+        self._config_rx = bytearray()
+
         if initialize_connection_and_radar:
             self.initialize()
 
@@ -213,21 +255,55 @@ class Radar:
         :param command: The command to send to radar config UART
         :type: str
         """
-        logger.trace(f"{self._config_port} - command: {command}")
+        # Format by loguru, only done if a sink accepts TRACE
+        logger.trace("{} - command: {}", self._config_port, command)
 
         self._config_serial.write(f"{command}\n".encode("utf-8"))
 
     def _send_command_safe(self, command: str) -> None:
         """Safe way to send command to radar config UART.
-        Add additional 0.1 seconds sleep after sending command.
+        Wait until the command is transmitted before returning.
 
         :param command: The command to send to radar config UART
         :type: str
         """
         self._send_command(command)
-        time.sleep(0.01)  # XXX: Serious? It could be affect by the baudrate
 
-    @logger.catch(reraise=True)
+        # Wait for the bytes to go out instead of a fixed sleep, as the time
+        # depends on the baudrate; the caller syncs on the prompt afterwards
+        self._config_serial.flush()
+
+    def _read_until_prompt(self) -> bytes:
+        """Read config UART until the `mmwDemo:/>` prompt or timeout
+
+        Same as `read_until`, but reads everything already waiting at once
+        instead of byte by byte, bytes past the prompt are kept for the
+        next call.
+
+        :return: Bytes up to and including the prompt, or what was read
+            before timeout
+        """
+        buf = self._config_rx
+        timeout = self._config_serial.timeout
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        pos = buf.find(_RADAR_PROMPT)
+        while pos < 0:
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+            # Block for one byte if nothing is waiting
+            chunk = self._config_serial.read(max(1, self._config_serial.in_waiting))
+            if not chunk:
+                break
+            start = max(0, len(buf) - len(_RADAR_PROMPT) + 1)
+            buf += chunk
+            pos = buf.find(_RADAR_PROMPT, start)
+
+        end = len(buf) if pos < 0 else pos + len(_RADAR_PROMPT)
+        response = bytes(buf[:end])
+        del buf[:end]
+        return response
+
     def _send_command_and_check_output(self, command: str) -> str:
         """Send command to radar config UART and check the output.
 
@@ -241,19 +317,25 @@ class Radar:
         self._send_command_safe(command)
         self._send_command("")  # Force a `mmwDemo:/>\n` response
 
-        response = self._config_serial.read_until(b"mmwDemo:/>\n")
-        logger.trace(f"{self._config_port} - raw resp: {response}")
+        response = self._read_until_prompt()
+        logger.trace("{} - raw resp: {!r}", self._config_port, response)
 
         if not response:
             raise RuntimeError(
                 f"{self._config_port} - No response from radar, try to increase timeout"
             )
 
-        response = re.findall(RADAR_OUTPUT_REGEX, response.decode("utf-8"), re.DOTALL)[
-            0
-        ].strip()
+        # Same as the first `RADAR_OUTPUT_REGEX` match: everything between the
+        # first newline and the following `mmwDemo` prompt
+        start = response.find(b"\n") + 1
+        end = response.find(b"mmwDemo", start) if start else -1
+        if end < 0:
+            raise RuntimeError(
+                f"{self._config_port} - Unexpected response from radar: {response!r}"
+            )
+        response = response[start:end].decode("utf-8").strip()
 
-        logger.trace(f"{self._config_port} - response: {response}")
+        logger.trace("{} - response: {}", self._config_port, response)
         if "Done" not in response:
             raise RuntimeError(
                 f"{self._config_port} - Command `{command}` failed: {response}"
@@ -264,8 +346,8 @@ class Radar:
         """Flush the radar config serial buffer"""
         self._send_command("")
 
-        flushed = self._config_serial.read_until(b"mmwDemo:/>\n")
-        logger.trace(f"{self._config_port} - flush: {flushed}")
+        flushed = self._read_until_prompt()
+        logger.trace("{} - flush: {!r}", self._config_port, flushed)
 
     def get_radar_status(self):
         """Get radar status (MMWAVE SDK OOB Demo)
@@ -274,8 +356,17 @@ class Radar:
         :rtype: Tuple[RadarStatus, int]1
         """
         resp = self._send_command_and_check_output("queryDemoStatus")
-        state, data_baudrate = re.search(RADAR_STATUS_QUERY_REGEX, resp).groups()
-        return RadarStatus(int(state)), int(data_baudrate)
+        # Take the first token after each label
+        try:
+            state = int(resp.split("Sensor State:", 1)[1].split(None, 1)[0])
+            data_baudrate = int(
+                resp.split("Data port baud rate:", 1)[1].split(None, 1)[0]
+            )
+        except (IndexError, ValueError) as e:
+            raise RuntimeError(
+                f"{self._config_port} - Unexpected radar status: {resp!r}"
+            ) from e
+        return RadarStatus(state), data_baudrate
 
     def initialize(self) -> None:
         """Connect to radar and flush the radar config serial buffer"""
@@ -289,6 +380,7 @@ class Radar:
         self._config_serial.baudrate = self._config_baudrate
         self._config_serial.timeout = self._timeout
         self._config_serial.open()
+        self._config_rx.clear()
 
         self._data_serial.port = self._data_port
         self._data_serial.baudrate = self._data_baudrate
@@ -296,9 +388,11 @@ class Radar:
         self._data_serial.open()
 
     def close_serials(self) -> None:
-        """Close serial ports"""
+        """Close serial ports, `initialize` is needed to use the radar again"""
         self._config_serial.close()
         self._data_serial.close()
+        self._config_rx.clear()
+        self._initialized = False
 
     @logger.catch(reraise=True)
     def config(self) -> None:
@@ -306,14 +400,9 @@ class Radar:
         if not self._initialized:
             raise Exception(f"{self._config_port} - Radar not initialized")
 
+        # `frameCfg` is already updated with `self._capture_frames` by the
+        # `capture_frames` setter
         for command in self._config:
-            # We need to replace frameCfg `number of frames` with `self._capture_frames`
-            # Ref: `frameCfg/number of frames`, p.24, MMWAVE SDK User Guide
-            if command.startswith("frameCfg"):
-                frame_cfg = command.split(" ")
-                frame_cfg[4] = f"{self._capture_frames:d}"
-                command = " ".join(frame_cfg)
-
             # Skip `sensorStart` command
             if command.startswith("sensorStart"):
                 continue
@@ -341,5 +430,11 @@ class Radar:
         with open(outfile, "w") as f:
             f.write("\n".join(self._config))
 
-    def __del__(self):
+    def __enter__(self) -> Radar:
+        """Initialize the radar connection if needed, close it on exit"""
+        if not self._initialized:
+            self.initialize()
+        return self
+
+    def __exit__(self, *exc) -> None:
         self.close_serials()
@@ -70,3 +70,143 @@ def test_capture_manager(capture_manager_config):
     cc = mmwavecapture.capture.CaptureManager(capture_manager_config)
     cc.init_hw()
     cc.capture()
+
+
+@pytest.fixture
+def minimal_config(tmp_path):
+    config = tmp_path / "config.toml"
+    config.write_text(
+        f"""dataset_dir = "{tmp_path / 'dataset'}"
+
+[metadata]
+date = "<today>"
+
+[logging.stderr]
+enable = false
+
+[logging.logfile]
+enable = false
+"""
+    )
+    return config
+
+
+def test_capture_manager_config_cache(minimal_config):
+    cc1 = mmwavecapture.capture.CaptureManager(minimal_config)
+    cc2 = mmwavecapture.capture.CaptureManager(minimal_config)
+
+    # Each manager get its own copy of the config
+    assert cc1._config is not cc2._config
+    assert cc1._config["metadata"] is not cc2._config["metadata"]
+    assert cc1._config["metadata"]["title"] == "Millimeter-wave dataset"
+
+
+def test_capture_manager_capture_id_counter(minimal_config, tmp_path):
+    dataset_dir = tmp_path / "dataset"
+
+    cc = mmwavecapture.capture.CaptureManager(minimal_config)
+    assert cc._capture_dir == dataset_dir / "capture_00000"
+    cc = mmwavecapture.capture.CaptureManager(minimal_config)
+    assert cc._capture_dir == dataset_dir / "capture_00001"
+    assert (dataset_dir / ".last_capture_id").read_text() == "1"
+
+    # Stale counter should fallback to scan the dataset directory
+    (dataset_dir / ".last_capture_id").write_text("0")
+    cc = mmwavecapture.capture.CaptureManager(minimal_config)
+    assert cc._capture_dir == dataset_dir / "capture_00002"
+
+    # Counter is trusted, the ID of a deleted last capture is not reused
+    (dataset_dir / "capture_00002").rmdir()
+    cc = mmwavecapture.capture.CaptureManager(minimal_config)
+    assert cc._capture_dir == dataset_dir / "capture_00003"
+
+    # Corrupt counter should fallback to scan the dataset directory
+    (dataset_dir / ".last_capture_id").write_text("corrupt")
+    cc = mmwavecapture.capture.CaptureManager(minimal_config)
+    assert cc._capture_dir == dataset_dir / "capture_00004"
+
+
+class DummyHardware(mmwavecapture.capture.CaptureHardware):
+    def __init__(self, hw_name, calls, fail_stage=None):
+        self.hw_name = hw_name
+        self._calls = calls
+        self._fail_stage = fail_stage
+
+    def _record(self, stage):
+        if stage == self._fail_stage:
+            raise RuntimeError(f"{self.hw_name} failed at {stage}")
+        self._calls.append((stage, self.hw_name))
+
+    def init_capture_hw(self):
+        self._record("init")
+
+    def prepare_capture(self):
+        self._record("prepare")
+
+    def start_capture(self):
+        self._record("start")
+
+    def stop_capture(self):
+        self._record("stop")
+
+    def dump_config(self):
+        self._record("dump")
+
+
+def test_capture_stages_barrier(tmp_path):
+    calls = []
+    cap = mmwavecapture.capture.Capture(tmp_path / "cap")
+    for name in ("hw1", "hw2", "hw3"):
+        cap.add_capture_hardware(DummyHardware(name, calls))
+    cap.capture()
+
+    stages = [stage for stage, _ in calls]
+    assert stages[:6] == ["prepare"] * 3 + ["start"] * 3
+    assert sorted(stages[6:]) == ["dump"] * 3 + ["stop"] * 3
+
+    # Dump right after stop for each hardware
+    for name in ("hw1", "hw2", "hw3"):
+        assert calls.index(("stop", name)) < calls.index(("dump", name))
+
+
+def test_capture_stage_exception(tmp_path):
+    calls = []
+    cap = mmwavecapture.capture.Capture(tmp_path / "cap")
+    cap.add_capture_hardware(DummyHardware("hw1", calls))
+    cap.add_capture_hardware(DummyHardware("hw2", calls, fail_stage="start"))
+
+    with pytest.raises(RuntimeError, match="hw2 failed at start"):
+        cap.capture()
+
+    # All hardware should be stopped, including the failed one
+    assert ("stop", "hw1") in calls
+    assert ("stop", "hw2") in calls
+    assert ("dump", "hw1") not in calls
+
+
+def test_capture_hardware_base_path(tmp_path):
+    hw = DummyHardware("hw", [])
+    with pytest.raises(ValueError, match="does not exist"):
+        hw.base_path = tmp_path / "missing"
+
+    (tmp_path / "file").touch()
+    with pytest.raises(ValueError, match="is not a directory"):
+        hw.base_path = tmp_path / "file"
+
+    hw.base_path = tmp_path
+    assert hw.base_path == tmp_path
+
+
+def test_capture_add_capture_hardwares(tmp_path):
+    cap = mmwavecapture.capture.Capture(tmp_path / "cap")
+    hws = [DummyHardware(name, []) for name in ("hw1", "hw2")]
+    cap.add_capture_hardwares(hws)
+
+    for hw in hws:
+        assert hw.base_path == tmp_path / "cap" / hw.hw_name
+        assert hw.base_path.is_dir()
+
+    # Hardware directory conflict with an existing file
+    (tmp_path / "cap" / "hw3").touch()
+    with pytest.raises(FileExistsError):
+        cap.add_capture_hardware(DummyHardware("hw3", []))
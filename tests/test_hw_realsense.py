@@ -34,6 +34,7 @@
 import pytest
 
 import pathlib
+import time
 
 from mmwavecapture.capture.realsense import Realsense
 
@@ -57,3 +58,36 @@ def test_hw_realsense_sensors_metadata(realsense):
     assert realsense._depth_config.intrinsics.width == realsense._depth_resolution[0]
     assert realsense._depth_config.intrinsics.height == realsense._depth_resolution[1]
     assert realsense._depth_config.depth_units == 0.0010000000474974513
+
+
+def test_hw_realsense_capture_stalled(realsense, tmp_path, monkeypatch):
+    monkeypatch.setattr(Realsense, "CAPTURE_STALL_TIMEOUT", 0.5)
+
+    # Camera stops delivering frames, the capture makes no progress
+    monkeypatch.setattr(
+        realsense, "_capture_frames_loop", realsense._capture_stop_event.wait
+    )
+
+    realsense.base_path = tmp_path
+    realsense.prepare_capture()
+    realsense.start_capture()
+    with pytest.raises(RuntimeError, match="capturing frames failed"):
+        realsense.stop_capture()
+
+
+def test_hw_realsense_capture_slow(realsense, tmp_path, monkeypatch):
+    monkeypatch.setattr(Realsense, "CAPTURE_STALL_TIMEOUT", 0.5)
+
+    # Slow encoder, the capture takes longer than the stall timeout but
+    # keeps capturing frames
+    def slow_capture_frames_loop():
+        for frame in range(5):
+            time.sleep(0.2)
+            realsense._captured_frames = frame + 1
+
+    monkeypatch.setattr(realsense, "_capture_frames_loop", slow_capture_frames_loop)
+
+    realsense.base_path = tmp_path
+    realsense.prepare_capture()
+    realsense.start_capture()
+    realsense.stop_capture()
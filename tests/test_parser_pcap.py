@@ -33,6 +33,7 @@
 
 import pathlib
 
+import numpy as np
 import pytest
 
 import mmwavecapture.parser.pcap
@@ -45,16 +46,37 @@ def cmd_pcap_filename():
     return pathlib.Path("tests/pcaps/test_cmd.pcap")
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def one_frame_pcap_filename():
     return pathlib.Path("tests/pcaps/test_one_frame.pcap")
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
+def one_frame_pcap_parsed(one_frame_pcap_filename):
+    return PcapCparser(
+        one_frame_pcap_filename,
+        data_ports=[4098],
+        lsb_quadrature=True,
+        preprocessing=True,
+    )
+
+
+@pytest.fixture(scope="session")
 def large_pcap():
     return pathlib.Path("wireshark/test_600_frames.pcap")
 
 
+@pytest.fixture(scope="session")
+def large_pcap_parsed(large_pcap):
+    # Parse the large pcap once per session, it is ~1 GB of samples
+    return PcapCparser(
+        large_pcap,
+        data_ports=[4098],
+        lsb_quadrature=True,
+        preprocessing=True,
+    )
+
+
 def test_pcap_iter_wrapper(cmd_pcap_filename):
     for p in parser._PcapIterWrapper(cmd_pcap_filename):
         assert p.udp.destination_port == 4096
@@ -90,41 +112,43 @@ def test_get_raw_bytes_from_pcap(one_frame_pcap_filename):
     assert len(raw_bytes) == 16384
 
 
-def test_cparser_get_complex(one_frame_pcap_filename):
-    data_ports = [4098]
-    pcap = PcapCparser(
-        one_frame_pcap_filename,
-        data_ports=data_ports,
-        lsb_quadrature=True,
-        preprocessing=True,
+def test_dump_raw_bytes_to_file(one_frame_pcap_filename, tmp_path):
+    outfile = tmp_path / "raw.bin"
+    n = parser.dump_raw_bytes_to_file(one_frame_pcap_filename, outfile, data_port=4098)
+    assert n == 16384
+    assert outfile.read_bytes() == parser.get_raw_bytes_from_pcap(
+        one_frame_pcap_filename, data_port=4098
     )
 
-    for port in data_ports:
-        assert pcap.validate_dca_data(port) == True
 
-        sig = pcap.get_complex(port)
+def test_cparser_get_complex(one_frame_pcap_parsed):
+    for port in one_frame_pcap_parsed.data_ports:
+        assert one_frame_pcap_parsed.validate_dca_data(port) == True
+
+        sig = one_frame_pcap_parsed.get_complex(port)
         assert sig.shape == (4096,)
-        assert sig[4065] == (223 + 120j)
-        assert sig[3293] == (-90 - 615j)
-        assert sig[415] == (-88 + 193j)
-        assert sig[1255] == (366 - 21j)
-        assert sig[671] == (-55 + 205j)
-        assert sig[1736] == (-127 - 238j)
-        assert sig[3474] == (268 - 48j)
-        assert sig[2394] == (745 - 301j)
-        assert sig[1262] == (582 + 30j)
 
+        # Spot check samples at known indices in one comparison
+        idx = np.array([4065, 3293, 415, 1255, 671, 1736, 3474, 2394, 1262])
+        expected = np.array(
+            [
+                223 + 120j,
+                -90 - 615j,
+                -88 + 193j,
+                366 - 21j,
+                -55 + 205j,
+                -127 - 238j,
+                268 - 48j,
+                745 - 301j,
+                582 + 30j,
+            ],
+            dtype=np.complex64,
+        )
+        np.testing.assert_array_equal(sig[idx], expected)
 
-@pytest.mark.manual
-def test_cparser_large_file_get_complex(large_pcap):
-    data_ports = [4098]
-    pcap = PcapCparser(
-        large_pcap,
-        data_ports=data_ports,
-        lsb_quadrature=True,
-        preprocessing=True,
-    )
 
-    for port in data_ports:
-        assert pcap.validate_dca_data(port) == True
-        assert pcap.get_complex(port).shape == (117964800,)
+@pytest.mark.manual
+def test_cparser_large_file_get_complex(large_pcap_parsed):
+    for port in large_pcap_parsed.data_ports:
+        assert large_pcap_parsed.validate_dca_data(port) == True
+        assert large_pcap_parsed.get_complex(port).shape == (117964800,)
@@ -39,6 +39,22 @@ import pathlib
 import mmwavecapture.radar
 
 
+# Every frame the OOB demo sends on the data UART starts with this magic word
+DEMO_MAGIC_WORD = b"\x02\x01\x04\x03\x06\x05\x08\x07"
+
+
+def _wait_for_frames(radar, frames, timeout):
+    """Read the data UART until `frames` frames arrived or `timeout`, and
+    return the number of frames seen"""
+    buf = bytearray()
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        buf += radar._data_serial.read(max(1, radar._data_serial.in_waiting))
+        if buf.count(DEMO_MAGIC_WORD) >= frames:
+            break
+    return buf.count(DEMO_MAGIC_WORD)
+
+
 @pytest.fixture
 def radar_config():
     return pathlib.Path("tests/configs/xwr18xx_profile_2023_01_01T00_00_00_000.cfg")
@@ -46,7 +62,7 @@ def radar_config():
 
 @pytest.fixture
 def radar_uninit(radar_config):
-    return mmwavecapture.radar.Radar(
+    radar = mmwavecapture.radar.Radar(
         config_port="/dev/ttyACM0",
         config_baudrate=115200,
         data_port="/dev/ttyACM1",
@@ -56,11 +72,13 @@ def radar_uninit(radar_config):
         initialize_connection_and_radar=False,
         capture_frames=10,
     )
+    yield radar
+    radar.close_serials()
 
 
 @pytest.fixture
 def radar(radar_config):
-    return mmwavecapture.radar.Radar(
+    radar = mmwavecapture.radar.Radar(
         config_port="/dev/ttyACM0",
         config_baudrate=115200,
         data_port="/dev/ttyACM1",
@@ -70,6 +88,8 @@ def radar(radar_config):
         initialize_connection_and_radar=True,
         capture_frames=10,
     )
+    yield radar
+    radar.close_serials()
 
 
 def test_radar_setter(radar_uninit):
@@ -79,6 +99,24 @@ def test_radar_setter(radar_uninit):
     assert radar_uninit.capture_frames == new_capture_frames
 
 
+def test_radar_status_malformed(radar_uninit, monkeypatch):
+    monkeypatch.setattr(
+        radar_uninit,
+        "_send_command_and_check_output",
+        lambda command: "Sensor State: 0\n\rData port baud rate: 921600\nDone",
+    )
+    assert radar_uninit.get_radar_status() == (
+        mmwavecapture.radar.RadarStatus(0),
+        921600,
+    )
+
+    monkeypatch.setattr(
+        radar_uninit, "_send_command_and_check_output", lambda command: "Done"
+    )
+    with pytest.raises(RuntimeError, match="Unexpected radar status"):
+        radar_uninit.get_radar_status()
+
+
 def test_radar_uninit(radar_uninit):
     assert radar_uninit._initialized == False
     assert radar_uninit._config_serial.is_open == False
@@ -88,6 +126,18 @@ def test_radar_uninit(radar_uninit):
         radar_uninit.config()
 
 
+def test_radar_context_manager_twice(radar_uninit):
+    for _ in range(2):
+        with radar_uninit as radar:
+            assert radar._initialized == True
+            assert radar._config_serial.is_open == True
+            radar.config()
+
+        assert radar_uninit._initialized == False
+        assert radar_uninit._config_serial.is_open == False
+        assert radar_uninit._data_serial.is_open == False
+
+
 def test_radar_uninit_then_init_and_config(radar_uninit):
     radar_uninit.initialize()
     radar_uninit.config()
@@ -119,10 +169,19 @@ def test_radar_init_config_and_start(radar):
     radar_status, data_baudrate = radar.get_radar_status()
     assert radar_status == mmwavecapture.radar.RadarStatus.STARTED
 
-    time.sleep(2)  # 2 seconds should be enough for 10 frames for 10 Hz (that is 1 sec)
+    # Wait for the 10 frames on the data UART instead of a fixed sleep
+    assert _wait_for_frames(radar, 10, timeout=3.0) == 10
     radar.stop_sensor()
 
 
 def test_radar_init_failed_command(radar):
     with pytest.raises(Exception):
         radar._send_command_and_check_output("Embedded Intellgence Lab @ UNC-CH")
+
+
+def test_radar_context_manager(radar_uninit):
+    with radar_uninit as radar:
+        assert radar._config_serial.is_open == True
+        assert radar._data_serial.is_open == True
+    assert radar_uninit._config_serial.is_open == False
+    assert radar_uninit._data_serial.is_open == False